@@ -36,6 +36,7 @@ setup(
     long_description_content_type="text/x-rst",
     include_package_data=True,
     name="wespe",
+    python_requires=">=3.7",
     packages=find_packages(
         include=["wespe", "wespe.*"], exclude=["*.tests", "*.tests.*"]
     ),
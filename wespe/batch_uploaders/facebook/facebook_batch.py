@@ -1,9 +1,13 @@
 import logging
+import random
+import time
 from functools import partial
-from typing import List, Union
+from itertools import compress
+from threading import Lock
+from typing import List, Sequence, Union
 
 from facebook_business.api import FacebookAdsApi, FacebookRequest, FacebookResponse
-from tenacity import retry, retry_if_result, stop_after_attempt, wait_exponential
+from tenacity import Future, RetryError
 
 from wespe.exceptions import (
     NoFacebookRequestProvidedError,
@@ -15,6 +19,9 @@ from .retries import should_retry_facebook_batch
 
 logger = logging.getLogger(__name__)
 
+# See more on https://developers.facebook.com/docs/graph-api/making-multiple-requests
+MAX_REQUESTS_PER_BATCH = 50
+
 
 class FacebookBatch:
     # Batch retrying parameters for transient errors
@@ -26,33 +33,113 @@ class FacebookBatch:
     WAIT_EXPONENTIAL_MAX_IN_SECONDS = (
         10  # The maximum waiting time derived from the exponential multiplier
     )
+    WAIT_JITTER_MAX_IN_SECONDS = (
+        1  # The maximum random time added on top, so concurrent batches don't retry in lockstep
+    )
+    WAIT_RETRY_AFTER_MAX_IN_SECONDS = (
+        60  # The maximum waiting time honored from a Retry-After header
+    )
 
-    def __init__(self, requests: List[FacebookRequest], api: FacebookAdsApi):
-        if not requests:
-            raise NoFacebookRequestProvidedError(
-                "At least one facebook request must be provided"
-            )
+    __slots__ = (
+        "_api",
+        "_batch",
+        "_requests",
+        "_responses",
+        "_errors",
+        "_offset",
+        "_pending",
+        "_callbacks",
+        "__weakref__",
+    )
 
+    def __init__(
+        self,
+        requests: Sequence[FacebookRequest],
+        api: FacebookAdsApi,
+        responses: List[Union[None, FacebookBatchResponse]] = None,
+        errors: List[Union[None, FacebookBatchRequestError]] = None,
+        offset: int = 0,
+    ):
+        self._callbacks = []
+
+        self.reset(requests, api, responses=responses, errors=errors, offset=offset)
+
+    def reset(
+        self,
+        requests: Sequence[FacebookRequest],
+        api: FacebookAdsApi,
+        responses: List[Union[None, FacebookBatchResponse]] = None,
+        errors: List[Union[None, FacebookBatchRequestError]] = None,
+        offset: int = 0,
+    ) -> "FacebookBatch":
+        """
+        Re-initialize this batch with a new set of requests, so it can be executed again without building a new
+        instance.
+
+        Responses and errors can be stored in lists shared with other batches, in which case this batch will only
+        use the slots starting at offset. Otherwise, lists sized for the given requests are allocated.
+
+        :param requests: a sequence of FacebookRequest instances.
+        :param api: a FacebookAdsApi instance.
+        :param responses: (Optional) a list to store the responses in.
+        :param errors: (Optional) a list to store the errors in.
+        :param offset: (Optional) the index of the first slot for this batch in responses and errors. Defaults to 0.
+        :raises: NoFacebookRequestProvidedError: when no request was provided.
+        :raises: TooManyRequestsPerBatchError: when more than 50 requests were provided.
+        :return: self.
+        """
         num_requests = len(requests)
 
-        if num_requests > 50:
-            # See more on https://developers.facebook.com/docs/graph-api/making-multiple-requests
+        # A single comparison chain is enough to tell valid batches apart, the cause is only worked out on failure
+        if not 0 < num_requests <= MAX_REQUESTS_PER_BATCH:
+            if not num_requests:
+                raise NoFacebookRequestProvidedError(
+                    "At least one facebook request must be provided"
+                )
+
             raise TooManyRequestsPerBatchError(
-                "A maximum of 50 requests per batch is supported"
+                "A maximum of {} requests per batch is supported".format(
+                    MAX_REQUESTS_PER_BATCH
+                )
             )
 
+        if responses is None:
+            responses = [None] * (offset + num_requests)
+        else:
+            responses[offset : offset + num_requests] = [None] * num_requests
+
+        if errors is None:
+            errors = [None] * (offset + num_requests)
+        else:
+            errors[offset : offset + num_requests] = [None] * num_requests
+
         self._api = api
         self._batch = None
         self._requests = requests
-        self._responses = [None] * num_requests
-        self._errors = [None] * num_requests
+        self._responses = responses
+        self._errors = errors
+        self._offset = offset
+        # Flags which requests still need to be sent, i.e. the ones without a response or with a transient error
+        self._pending = bytearray(b"\x01") * num_requests
+        # Callbacks are bound once per request index, so that retries and resets don't need to build them all over
+        # again. Any extra callbacks left over from a bigger set of requests are simply never used. The index is
+        # bound positionally, since partials holding keyword arguments copy them into a new dict on every call.
+        self._callbacks.extend(
+            (
+                partial(self._default_success_callback, request_index),
+                partial(self._default_failure_callback, request_index),
+            )
+            for request_index in range(len(self._callbacks), num_requests)
+        )
+
+        return self
 
     @property
-    def requests(self) -> List[FacebookRequest]:
+    def requests(self) -> Sequence[FacebookRequest]:
         """
         Returns all FacebookRequest instances.
 
-        :return: a list of FacebookRequest instances.
+        :return: a sequence of FacebookRequest instances.
         """
         return self._requests
 
@@ -65,7 +152,7 @@ class FacebookBatch:
 
         :return: a list of FacebookBatchResponse instance and/or None.
         """
-        return self._responses
+        return self._responses[self._offset : self._offset + len(self._requests)]
 
     @property
     def errors(self) -> List[Union[None, FacebookBatchRequestError]]:
@@ -76,65 +163,102 @@ class FacebookBatch:
 
         :return: a list of FacebookBatchRequestError instances and/or None.
         """
-        return self._errors
+        return self._errors[self._offset : self._offset + len(self._requests)]
 
-    @retry()
     def execute(self) -> "FacebookBatch":
         """
         Execute all requests. This method will be retried for any failed transient errors. For such we employ an
         exponential backoff approach.
 
         The exponential back off defaults to wait 2^x * 1 seconds between each retry, up to 10 seconds, then 10
-        seconds afterwards for a maximum of 5 attempts. Those values can be tweaked by playing with MAX_ATTEMPTS,
-        WAIT_EXPONENTIAL_MULTIPLIER, WAIT_EXPONENTIAL_MIN_IN_SECONDS, and WAIT_EXPONENTIAL_MAX_IN_SECONDS static
-        variables.
+        seconds afterwards for a maximum of 5 attempts. Whenever Facebook tells how long to wait through a
+        Retry-After header, that is honored instead, up to 60 seconds. A random jitter of up to 1 second is added
+        on top of every wait, so a single wait may take up to 11 seconds, or 61 when honoring Retry-After.
+
+        Those values can be tweaked by playing with MAX_ATTEMPTS, WAIT_EXPONENTIAL_MULTIPLIER,
+        WAIT_EXPONENTIAL_MIN_IN_SECONDS, WAIT_EXPONENTIAL_MAX_IN_SECONDS, WAIT_RETRY_AFTER_MAX_IN_SECONDS and
+        WAIT_JITTER_MAX_IN_SECONDS static variables.
 
         :raises: RetryError: when retries failed for MAX_ATTEMPTS.
         :return: self.
         """
-        # We set the retry settings during runtime, so don't worry about this method never finishing
-        self._initialize_execution_retrial_conditions()
+        attempt_number = 0
 
-        self._batch = self._api.new_batch()
+        while True:
+            attempt_number += 1
+            self._execute_once()
 
-        for request_index, request in enumerate(self._requests):
-            response = self.responses[request_index]
-            error = self.errors[request_index]
+            if not should_retry_facebook_batch(self):
+                return self
 
-            if (response is None and error is None) or (error and error.is_transient):
-                self._batch.add_request(
-                    request,
-                    success=partial(
-                        self._default_success_callback, request_index=request_index
-                    ),
-                    failure=partial(
-                        self._default_failure_callback, request_index=request_index
-                    ),
-                )
+            if attempt_number >= self.MAX_ATTEMPTS:
+                raise RetryError(Future.construct(attempt_number, self, False))
 
-        self._batch.execute()
+            time.sleep(self._get_waiting_time_in_seconds(attempt_number))
 
-        return self
+    def _execute_once(self):
+        """
+        Execute all requests that have neither a response nor a non-transient error yet, in a single attempt.
+        """
+        self._batch = batch = self._api.new_batch()
+        requests, callbacks = self._requests, self._callbacks
+
+        for request_index in compress(range(len(requests)), self._pending):
+            success, failure = callbacks[request_index]
+            batch.add_request(requests[request_index], success=success, failure=failure)
+
+        batch.execute()
+
+    def _get_waiting_time_in_seconds(self, attempt_number: int) -> float:
+        """
+        Returns the time to wait after the given failed attempt, before executing the batch once again. It grows
+        exponentially with the attempt number, bounded by WAIT_EXPONENTIAL_MIN_IN_SECONDS and
+        WAIT_EXPONENTIAL_MAX_IN_SECONDS. When Facebook asked to wait through a Retry-After header, the longest
+        of such times is used instead, bounded by WAIT_RETRY_AFTER_MAX_IN_SECONDS. Either way, a random jitter of
+        up to WAIT_JITTER_MAX_IN_SECONDS is added.
+
+        :param attempt_number: the number of the attempt that just failed, starting at 1.
+        :return: a number of seconds.
+        """
+        retry_after = self._get_retry_after_in_seconds()
+
+        if retry_after is not None:
+            waiting_time = min(retry_after, self.WAIT_RETRY_AFTER_MAX_IN_SECONDS)
+        else:
+            try:
+                waiting_time = self.WAIT_EXPONENTIAL_MULTIPLIER * 2 ** (attempt_number - 1)
+            except OverflowError:
+                waiting_time = self.WAIT_EXPONENTIAL_MAX_IN_SECONDS
+
+            waiting_time = max(
+                self.WAIT_EXPONENTIAL_MIN_IN_SECONDS,
+                min(waiting_time, self.WAIT_EXPONENTIAL_MAX_IN_SECONDS),
+            )
+
+        if not self.WAIT_JITTER_MAX_IN_SECONDS:
+            return waiting_time
 
-    def _initialize_execution_retrial_conditions(self):
+        return waiting_time + random.uniform(0, self.WAIT_JITTER_MAX_IN_SECONDS)
+
+    def _get_retry_after_in_seconds(self) -> Union[None, float]:
         """
-        This will re-initialize, during runtime, the arguments of the retry decorator wrapping the execute method
-        with class-level retry settings. Those are MAX_ATTEMPTS, WAIT_EXPONENTIAL_MULTIPLIER,
-        WAIT_EXPONENTIAL_MIN_IN_SECONDS, and WAIT_EXPONENTIAL_MAX_IN_SECONDS.
+        Returns the longest time Facebook asked to wait for, among the requests failed with a transient error.
 
-        :return:
+        :return: a number of seconds or None, when no such request provided a Retry-After header.
         """
-        retry_settings = self.execute.retry
-        retry_settings.retry = retry_if_result(should_retry_facebook_batch)
-        retry_settings.stop = stop_after_attempt(self.MAX_ATTEMPTS)
-        retry_settings.wait = wait_exponential(
-            multiplier=self.WAIT_EXPONENTIAL_MULTIPLIER,
-            min=self.WAIT_EXPONENTIAL_MIN_IN_SECONDS,
-            max=self.WAIT_EXPONENTIAL_MAX_IN_SECONDS,
+        retry_afters = [
+            error.retry_after
+            for error in self.errors
+            if error is not None and error.is_transient
+        ]
+
+        return max(
+            (retry_after for retry_after in retry_afters if retry_after is not None),
+            default=None,
         )
 
     def _default_failure_callback(
-        self, response: FacebookResponse, request_index: int, object_id: int = None
+        self, request_index: int, response: FacebookResponse, object_id: int = None
     ):
         """
         A method that can be used to raise exceptions when the batch object is used for bulk operations.
@@ -142,48 +266,114 @@ class FacebookBatch:
 
         This is intended to be used as a default callback to fallback to in case a user does not provide one.
 
-        :param response: Facebook response object.
         :param request_index: The index of the request in the whole batch.
+        :param response: Facebook response object.
         :param object_id: (Optional) The ID of the object being updated.
         """
-        request = self._requests[request_index]
         batch__error = FacebookBatchRequestError(
-            request=request, request_error=response.error()
+            request=self._requests[request_index], request_error=response.error()
         )
-        self._responses[request_index] = None
-        self._errors[request_index] = batch__error
-
-        error_msg = ["#{} -".format(request_index)]
+        slot_index = self._offset + request_index
+        self._responses[slot_index] = None
+        self._errors[slot_index] = batch__error
+        self._pending[request_index] = 1 if batch__error.is_transient else 0
+
+        # Logs refer to requests by their index among all of the uploader's requests, not within this batch
+        extra = {
+            "request_index": slot_index,
+            "batch_request_index": request_index,
+            "object_id": object_id,
+        }
 
         if object_id:
-            error_msg.append("Error updating object with id [{}].".format(object_id))
-
-        error_msg.append(str(batch__error))
-
-        logger.error(" ".join(error_msg))
+            logger.error(
+                "#%s - Error updating object with id [%s]. %s",
+                slot_index,
+                object_id,
+                batch__error,
+                extra=extra,
+            )
+        else:
+            logger.error("#%s - %s", slot_index, batch__error, extra=extra)
 
     def _default_success_callback(
-        self, response: FacebookResponse, request_index: int, object_id: int = None
+        self, request_index: int, response: FacebookResponse, object_id: int = None
     ):
         """
         A method that can be used to log when the batch object has completed successfully.
 
         This is intended to be used as a default callback to fallback to in case a user does not provide one.
 
-        :param response: Facebook response object.
         :param request_index: The index of the request in the whole batch.
+        :param response: Facebook response object.
         :param object_id: The ID of the object being updated.
         """
-        request = self._requests[request_index]
-        batch_response = FacebookBatchResponse(request=request, response=response)
-        self._responses[request_index] = batch_response
-        self._errors[request_index] = None
+        data = response.json()
+        batch_response = FacebookBatchResponse(
+            request=self._requests[request_index], response=response, data=data
+        )
+        slot_index = self._offset + request_index
+        self._responses[slot_index] = batch_response
+        self._errors[slot_index] = None
+        self._pending[request_index] = 0
+
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
 
-        if object_id is None:
-            object_id = response.json().get("id")
+        if object_id is None and isinstance(data, dict):
+            object_id = data.get("id")
 
         logger.debug(
-            "Request #{}: Object with id [{}] updated successfully!".format(
-                request_index, str(object_id)
-            )
+            "Request #%s: Object with id [%s] updated successfully!",
+            slot_index,
+            object_id,
+            extra={
+                "request_index": slot_index,
+                "batch_request_index": request_index,
+                "object_id": object_id,
+            },
         )
+
+
+class _FacebookBatchPool:
+    """
+    A thread-safe pool of FacebookBatch instances, which are reset and handed out again once released.
+    """
+
+    __slots__ = ("_lock", "_batches")
+
+    def __init__(self):
+        self._lock = Lock()
+        self._batches = []
+
+    def acquire(self, requests: Sequence[FacebookRequest], api: FacebookAdsApi, **kwargs) -> FacebookBatch:
+        """
+        Returns a FacebookBatch for the given requests, reusing a released one if available.
+
+        :param requests: a sequence of FacebookRequest instances.
+        :param api: a FacebookAdsApi instance.
+        :param kwargs: any other arguments accepted by FacebookBatch.reset.
+        :return: a FacebookBatch instance.
+        """
+        with self._lock:
+            batch = self._batches.pop() if self._batches else None
+
+        if batch is None:
+            return FacebookBatch(requests, api=api, **kwargs)
+
+        return batch.reset(requests, api, **kwargs)
+
+    def release(self, batch: FacebookBatch):
+        """
+        Returns a FacebookBatch to the pool. The batch must not be used by the caller afterwards.
+
+        :param batch: a FacebookBatch instance.
+        """
+        # Idle batches must not keep the last execution's requests, SDK batch and results alive
+        batch._batch = None
+        batch._requests = ()
+        batch._responses = []
+        batch._errors = []
+
+        with self._lock:
+            self._batches.append(batch)
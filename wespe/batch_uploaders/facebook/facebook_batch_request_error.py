@@ -1,4 +1,6 @@
 import logging
+import math
+from typing import Mapping, Union
 
 from facebook_business.api import (
     FacebookRequest,
@@ -12,6 +14,8 @@ logger = logging.getLogger(__name__)
 
 
 class FacebookBatchRequestError(BaseRequestError):
+    __slots__ = ("request", "request_error")
+
     def __init__(self, request: FacebookRequest, request_error: FacebookRequestError):
         super().__init__(
             description=request_error.api_error_message(),
@@ -24,6 +28,38 @@ class FacebookBatchRequestError(BaseRequestError):
         self.request = request
         self.request_error = request_error
 
+    @property
+    def retry_after(self) -> Union[None, float]:
+        """
+        Returns how long Facebook asked to wait before retrying the request, according to its Retry-After header.
+
+        :return: a number of seconds or None, when no valid such header was provided.
+        """
+        headers = self.request_error.http_headers()
+
+        # Responses within a batch carry their headers as a list of name and value pairs
+        if isinstance(headers, (list, tuple)):
+            headers = {
+                str(header.get("name")).lower(): header.get("value")
+                for header in headers
+                if isinstance(header, dict)
+            }
+        elif isinstance(headers, Mapping):
+            headers = {str(name).lower(): value for name, value in headers.items()}
+        else:
+            return None
+
+        try:
+            retry_after = float(headers["retry-after"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        # Neither nan nor infinity are a time anyone can wait for
+        if not math.isfinite(retry_after):
+            return None
+
+        return max(retry_after, 0.0)
+
     def __repr__(self):
         return "FacebookRequestError:{}\nWhen using params: {}.".format(
             self.request_error, self.request.get_params()
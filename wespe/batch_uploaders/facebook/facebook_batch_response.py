@@ -12,8 +12,11 @@ logger = logging.getLogger(__name__)
 
 
 class FacebookBatchResponse(BaseResponse):
-    def __init__(self, request: FacebookRequest, response: FacebookResponse):
-        super().__init__(data=response.json())
+    __slots__ = ("request", "response")
+
+    def __init__(self, request: FacebookRequest, response: FacebookResponse, data: dict = None):
+        # The response body is parsed on every json call, so callers that parsed it already can provide it as data
+        super().__init__(data=response.json() if data is None else data)
 
         self.request = request
         self.response = response
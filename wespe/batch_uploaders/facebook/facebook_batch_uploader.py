@@ -1,7 +1,12 @@
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 from typing import (
-    Generator,
+    Iterable,
     List,
+    Sequence,
     Tuple,
     Union,
 )
@@ -10,6 +15,8 @@ from facebook_business.api import (
     FacebookAdsApi,
     FacebookRequest,
 )
+from requests import Session
+from requests.adapters import HTTPAdapter
 from tenacity import (
     RetryError,
 )
@@ -18,7 +25,7 @@ from wespe.exceptions import (
     BatchExecutionError,
     InvalidValueError,
 )
-from .facebook_batch import FacebookBatch
+from .facebook_batch import MAX_REQUESTS_PER_BATCH, _FacebookBatchPool
 from .facebook_batch_request_error import FacebookBatchRequestError
 from .facebook_batch_response import FacebookBatchResponse
 
@@ -26,57 +33,191 @@ logger = logging.getLogger(__name__)
 
 
 class FacebookBatchUploader:
-    def __init__(self, requests: List[FacebookRequest], api: FacebookAdsApi = None):
+    def __init__(
+        self,
+        requests: Sequence[FacebookRequest],
+        api: FacebookAdsApi = None,
+        max_workers: int = 4,
+    ):
         self.api = api or FacebookAdsApi.get_default_api()
+        self.max_workers = max_workers
 
         self._requests = requests
-        self._batches = []
+        self._responses = []
+        self._errors = []
+        self._pool = _FacebookBatchPool()
 
-    def execute(self, chunk_size: int = 50) -> 'FacebookBatchUploader':
+    def execute(
+        self, chunk_size: int = MAX_REQUESTS_PER_BATCH, max_workers: int = None
+    ) -> 'FacebookBatchUploader':
         """
-        Execute all requests in batches of chunk_size amount.
+        Execute all requests in batches of chunk_size amount. Batches are independent from each other, so they are
+        executed concurrently by a pool of max_workers threads.
+
+        Keep in mind Facebook enforces rate limits per app and ad account. Executing more batches at the same time
+        will make the upload finish sooner, but it will also consume your quota faster and might lead to throttling
+        errors. Use max_workers=1 to execute batches one after another.
 
         :param chunk_size:
             (Optional) The amount of requests per chunk. Keep in mind this value should be between 1 and 50, otherwise
             an exception will be raised. Defaults to 50.
+        :param max_workers:
+            (Optional) The maximum amount of batches executed concurrently. Keep in mind this value should be
+            greater than 0, otherwise an exception will be raised. Defaults to the max_workers provided to the
+            constructor, which is 4 unless stated otherwise.
         :raises: BatchExecutionError: when one or more requests failed.
         :return: self.
         """
-        num_requests = len(self.requests)
+        requests = self._requests
+        num_requests = len(requests)
+
+        if not 1 <= chunk_size <= MAX_REQUESTS_PER_BATCH:
+            raise InvalidValueError(
+                "Chunk size must be between 1 and {}".format(MAX_REQUESTS_PER_BATCH)
+            )
+
+        if max_workers is None:
+            max_workers = self.max_workers
 
-        if chunk_size < 1 or chunk_size > 50:
-            raise InvalidValueError("Chunk size must be between 1 and 50")
+        if max_workers < 1:
+            raise InvalidValueError("Max workers must be greater than 0")
 
-        for i in range(0, num_requests, chunk_size):
-            batch = FacebookBatch(self.requests[i : i + chunk_size], api=self.api)
-            self._batches.append(batch)
+        self._responses = [None] * num_requests
+        self._errors = [None] * num_requests
 
-            try:
-                batch.execute()
-            except RetryError:
-                pass
+        # Chunks are consumed straight from the requests iterator, until an empty chunk signals its exhaustion
+        requests_iterator = iter(requests)
+        chunks = iter(lambda: list(islice(requests_iterator, chunk_size)), [])
 
-        errors = list(self.errors)
+        # There is no point in spawning more threads than there are chunks to execute
+        num_chunks = (num_requests + chunk_size - 1) // chunk_size
+        max_workers = min(max_workers, num_chunks) or 1
+        self._fit_connection_pool(max_workers)
 
-        if any(errors):
-            exception_msg = "{} requests failed out of {}\n\n{}".format(
-                len(errors), num_requests, errors
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(
+                executor.map(
+                    self._execute_chunk, range(0, num_requests, chunk_size), chunks
+                )
+            )
+
+        # Errors are told apart from empty slots by identity, so their own __eq__ is never involved
+        errors = self.errors
+        num_failed_requests = sum(error is not None for error in errors)
+
+        if num_failed_requests:
+            raise BatchExecutionError(
+                num_failed_requests=num_failed_requests,
+                num_requests=num_requests,
+                errors=errors,
             )
-            raise BatchExecutionError(exception_msg)
 
         return self
 
+    async def execute_async(
+        self, chunk_size: int = MAX_REQUESTS_PER_BATCH, max_workers: int = None
+    ) -> 'FacebookBatchUploader':
+        """
+        Same as execute, but awaitable from within an asyncio event loop. The facebook_business transport is
+        synchronous, so batches are still executed by a pool of max_workers threads, while the event loop is free
+        to run other tasks until all of them are done.
+
+        :param chunk_size:
+            (Optional) The amount of requests per chunk. Keep in mind this value should be between 1 and 50, otherwise
+            an exception will be raised. Defaults to 50.
+        :param max_workers:
+            (Optional) The maximum amount of batches executed concurrently. Defaults to the max_workers provided to
+            the constructor.
+        :raises: BatchExecutionError: when one or more requests failed.
+        :return: self.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, partial(self.execute, chunk_size, max_workers)
+        )
+
+    def _fit_connection_pool(self, max_workers: int):
+        """
+        Make sure the HTTP session used by the api keeps enough connections alive for max_workers concurrent
+        batches. Otherwise connections exceeding the pool size are discarded after every batch, and have to be
+        established all over again for the next one.
+
+        The session is shared by all batches and kept across executions, so connections are only ever opened once
+        per worker. A bigger pool is only mounted when needed, leaving a fitting one untouched. Custom adapters are
+        never replaced, since that would drop whatever behavior they add.
+
+        :param max_workers: the maximum amount of batches executed concurrently.
+        """
+        facebook_session = getattr(self.api, "_session", None)
+        session = getattr(facebook_session, "requests", None)
+
+        if not isinstance(session, Session):
+            return
+
+        adapter = session.get_adapter(facebook_session.GRAPH)
+
+        if type(adapter) is not HTTPAdapter:
+            logger.info(
+                "Keeping custom adapter %s for %s, make sure its pool fits %s connections",
+                type(adapter).__name__,
+                facebook_session.GRAPH,
+                max_workers,
+                extra={"max_workers": max_workers},
+            )
+            return
+
+        # HTTPAdapter has no public accessors for its pool settings, these attributes are the state it pickles
+        if adapter._pool_maxsize >= max_workers:
+            return
+
+        session.mount(
+            facebook_session.GRAPH,
+            HTTPAdapter(
+                pool_connections=adapter._pool_connections,
+                pool_maxsize=max_workers,
+                max_retries=adapter.max_retries,
+                pool_block=adapter._pool_block,
+            ),
+        )
+
+        # The replaced adapter would otherwise keep its idle connections open
+        adapter.close()
+
+    def _execute_chunk(self, start: int, requests: Sequence[FacebookRequest]):
+        """
+        Execute a chunk of requests in a single batch. Batches that exhausted their retries are not considered a
+        failure at this point, since their errors will be reported altogether once all chunks were executed.
+
+        :param start: the index of the first request of the chunk among all requests.
+        :param requests: the FacebookRequest instances of the chunk.
+        """
+        # Each batch only ever writes to the slots of its own chunk, hence no locking is needed
+        batch = self._pool.acquire(
+            requests,
+            api=self.api,
+            responses=self._responses,
+            errors=self._errors,
+            offset=start,
+        )
+
+        try:
+            batch.execute()
+        except RetryError:
+            pass
+        finally:
+            self._pool.release(batch)
+
     @property
-    def requests(self) -> List[FacebookRequest]:
+    def requests(self) -> Sequence[FacebookRequest]:
         """
         Returns all FacebookRequest instances.
 
-        :return: a list of FacebookRequest instances.
+        :return: a sequence of FacebookRequest instances.
         """
         return self._requests
 
     @property
-    def responses(self) -> Generator[Union[None, FacebookBatchResponse], None, None]:
+    def responses(self) -> List[Union[None, FacebookBatchResponse]]:
         """
         Returns the responses for the executed FacebookRequest instances. The amount and order of elements will
         be the same as of FacebookRequest instances. FacebookRequest with errors will have None as their value
@@ -84,40 +225,33 @@ class FacebookBatchUploader:
 
         :return: a list of FacebookBatchResponse instance and/or None.
         """
-        for batch in self._batches:
-            for response in batch.responses:
-                yield response
+        return self._responses
 
     @property
-    def errors(self) -> Generator[Union[None, FacebookBatchRequestError], None, None]:
+    def errors(self) -> List[Union[None, FacebookBatchRequestError]]:
         """
         Returns the errors for the executed FacebookRequest instances. The amount and order of elements will
         be the same as of FacebookRequest instances. FacebookRequest without errors will have None as their value
         in the respective index.
 
-        :return: a generator of FacebookBatchRequestError instances and/or None.
+        :return: a list of FacebookBatchRequestError instances and/or None.
         """
-        for batch in self._batches:
-            for response in batch.errors:
-                yield response
+        return self._errors
 
     @property
     def items(
         self,
-    ) -> Generator[
+    ) -> Iterable[
         Tuple[
             FacebookRequest,
             Union[None, FacebookBatchResponse],
             Union[None, FacebookBatchRequestError],
-        ],
-        None,
-        None,
+        ]
     ]:
         """
         Returns a list of tuples shaped as FacebookRequest instance and its respective response/error.
 
-        :return: a list of tuples shaped as (request, FacebookBatchResponse or None, FacebookBatchRequestError
+        :return: an iterable of tuples shaped as (request, FacebookBatchResponse or None, FacebookBatchRequestError
                  instance or None).
         """
-        for request, response, error in zip(self.requests, self.responses, self.errors):
-            yield request, response, error
+        return zip(self._requests, self._responses, self._errors)
@@ -1,10 +1,9 @@
 def should_retry_facebook_batch(facebook_batch) -> bool:
     """
-    Returns True when all the failed requests, if any, are transient errors. Otherwise False.
+    Returns True when any of the failed requests, if any, is a transient error. Otherwise False.
 
     :return: a boolean.
     """
     return any(
-        error.is_transient if error else False
-        for error in facebook_batch.errors
+        error.is_transient for error in facebook_batch.errors if error is not None
     )
@@ -1,4 +1,6 @@
 class BaseResponse:
+    __slots__ = ("_data", "__weakref__")
+
     def __init__(self, data: dict):
         self._data = data
 
@@ -12,13 +14,25 @@ class BaseResponse:
         return self._data
 
     def __eq__(self, other):
-        return self._data == other._data
+        if self is other:
+            return True
+
+        if not isinstance(other, BaseResponse):
+            return NotImplemented
+
+        # Instances built from the same payload are equal, without walking it
+        return self._data is other._data or self._data == other._data
+
+    # Payloads are mutable dictionaries, so responses can't be hashed
+    __hash__ = None
 
     def __str__(self):
-        return self.data
+        return str(self._data)
 
 
 class BaseRequestError:
+    __slots__ = ("_is_transient", "_description", "_data", "__weakref__")
+
     def __init__(self, description: str, is_transient: bool, data: dict):
         self._is_transient = is_transient
         self._description = description
@@ -53,7 +67,17 @@ class BaseRequestError:
         return self._data
 
     def __eq__(self, other):
-        return self._data == other._data
+        if self is other:
+            return True
+
+        if not isinstance(other, BaseRequestError):
+            return NotImplemented
+
+        # Instances built from the same payload are equal, without walking it
+        return self._data is other._data or self._data == other._data
+
+    # Payloads are mutable dictionaries, so errors can't be hashed
+    __hash__ = None
 
     def __repr__(self):
-        return self.data
+        return repr(self._data)
@@ -1,4 +1,5 @@
 # coding: utf8
+import weakref
 from unittest import TestCase
 from unittest.mock import (
     ANY,
@@ -14,6 +15,7 @@ from wespe.batch_uploaders.facebook import (
     FacebookBatchRequestError,
     FacebookBatchResponse,
 )
+from wespe.batch_uploaders.facebook.facebook_batch import MAX_REQUESTS_PER_BATCH
 from wespe.exceptions import (
     NoFacebookRequestProvidedError,
     TooManyRequestsPerBatchError,
@@ -23,11 +25,16 @@ from wespe.exceptions import (
 FacebookBatch.WAIT_EXPONENTIAL_MULTIPLIER = 0
 FacebookBatch.WAIT_EXPONENTIAL_MIN_IN_SECONDS = 0
 FacebookBatch.WAIT_EXPONENTIAL_MAX_IN_SECONDS = 0
+FacebookBatch.WAIT_JITTER_MAX_IN_SECONDS = 0
+
+# Requests are only handed over to the mocked api, so tests that need no distinct ones can share a single stub
+STUB_REQUEST = MagicMock()
 
 
 class TestFacebookBatch(TestCase):
     def setUp(self):
-        self.requests = [MagicMock()] * 10
+        STUB_REQUEST.reset_mock()
+        self.requests = [STUB_REQUEST] * 10
         self.api = MagicMock()
         self.batch = FacebookBatch(requests=self.requests, api=self.api)
 
@@ -40,13 +47,14 @@ class TestFacebookBatch(TestCase):
     def test_constructor_does_not_raise_TooManyRequestsPerBatchError_when_exactly_50_requests_were_provided(
         self,
     ):
-        FacebookBatch(requests=[MagicMock()] * 50, api=self.api)
+        self.assertEqual(MAX_REQUESTS_PER_BATCH, 50)
+        FacebookBatch(requests=[STUB_REQUEST] * MAX_REQUESTS_PER_BATCH, api=self.api)
 
     def test_constructor_raises_TooManyRequestsPerBatchError_when_more_than_50_requests_were_provided(
         self,
     ):
         with self.assertRaises(TooManyRequestsPerBatchError):
-            FacebookBatch(requests=[MagicMock()] * 51, api=self.api)
+            FacebookBatch(requests=[STUB_REQUEST] * (MAX_REQUESTS_PER_BATCH + 1), api=self.api)
 
     def test_constructor_initialiazes_batch_as_None(self):
         self.assertIsNone(self.batch._batch)
@@ -73,6 +81,10 @@ class TestFacebookBatch(TestCase):
         # This ensures our tests are never initiliazed with a waiting time between retries
         self.assertEqual(self.batch.WAIT_EXPONENTIAL_MAX_IN_SECONDS, 0)
 
+    def test_WAIT_JITTER_MAX_IN_SECONDS_is_0_for_this_test_case(self):
+        # This ensures our tests are never initiliazed with a waiting time between retries
+        self.assertEqual(self.batch.WAIT_JITTER_MAX_IN_SECONDS, 0)
+
     def test_default_failure_callback_sets_the_error_in_error_list(self):
         request_index = 3
         response = MagicMock()
@@ -99,12 +111,60 @@ class TestFacebookBatch(TestCase):
             FacebookBatchResponse(request=response.request(), response=response),
         )
 
-    @patch.object(FacebookBatch, "_initialize_execution_retrial_conditions")
-    def test_execute_calls_initialize_execution_retrial_conditions(
-        self, mock_initialize_execution_retrial_conditions
-    ):
+    def test_default_success_callback_parses_the_response_only_once(self):
+        response = MagicMock()
+        self.batch._default_success_callback(response=response, request_index=3)
+
+        response.json.assert_called_once_with()
+
+    def test_default_success_callback_defers_log_formatting_to_the_logger(self):
+        response = MagicMock()
+
+        with patch("wespe.batch_uploaders.facebook.facebook_batch.logger") as mock_logger:
+            self.batch._default_success_callback(
+                response=response, request_index=3, object_id=7
+            )
+
+        mock_logger.debug.assert_called_once_with(
+            ANY, 3, 7, extra={"request_index": 3, "batch_request_index": 3, "object_id": 7}
+        )
+
+    def test_default_callbacks_log_the_index_among_all_requests_of_the_uploader(self):
+        self.batch.reset(
+            [STUB_REQUEST] * 5, api=self.api, responses=[None] * 20, errors=[None] * 20, offset=13
+        )
+        extra = {"request_index": 14, "batch_request_index": 1, "object_id": 7}
+
+        with patch("wespe.batch_uploaders.facebook.facebook_batch.logger") as mock_logger:
+            self.batch._default_success_callback(response=MagicMock(), request_index=1, object_id=7)
+            self.batch._default_failure_callback(response=MagicMock(), request_index=1, object_id=7)
+
+        with self.subTest("success"):
+            mock_logger.debug.assert_called_once_with(ANY, 14, 7, extra=extra)
+
+        with self.subTest("failure"):
+            mock_logger.error.assert_called_once_with(ANY, 14, 7, ANY, extra=extra)
+
+    def test_default_success_callback_does_not_log_when_debug_is_disabled(self):
+        response = MagicMock()
+
+        with patch("wespe.batch_uploaders.facebook.facebook_batch.logger") as mock_logger:
+            mock_logger.isEnabledFor.return_value = False
+            self.batch._default_success_callback(response=response, request_index=3)
+
+        mock_logger.debug.assert_not_called()
+
+    def test_execute_passes_callbacks_that_only_take_the_response(self):
+        response = MagicMock()
         self.batch.execute()
-        mock_initialize_execution_retrial_conditions.assert_called_once_with()
+
+        _, kwargs = self.batch._batch.add_request.call_args_list[3]
+        kwargs["success"](response)
+
+        self.assertEqual(
+            self.batch._responses[3],
+            FacebookBatchResponse(request=response.request(), response=response),
+        )
 
     def test_execute_calls_add_request_on_batch_as_many_times_as_requests_exist(self):
         self.batch.execute()
@@ -115,11 +175,24 @@ class TestFacebookBatch(TestCase):
             ]
         )
 
+    def test_execute_reuses_the_same_callbacks_across_executions(self):
+        self.api.new_batch.side_effect = [MagicMock(), MagicMock()]
+
+        first_batch = self.batch.execute()._batch
+        second_batch = self.batch.execute()._batch
+
+        self.assertListEqual(
+            first_batch.add_request.call_args_list,
+            second_batch.add_request.call_args_list,
+        )
+
     def test_execute_calls_add_request_on_batch_ignores_requests_that_have_a_response_set_already(
         self,
     ):
         for request_index, _ in enumerate(self.requests[:-1]):
-            self.batch._responses[request_index] = MagicMock()
+            self.batch._default_success_callback(
+                response=MagicMock(), request_index=request_index
+            )
 
         self.batch.execute()
 
@@ -128,9 +201,14 @@ class TestFacebookBatch(TestCase):
     def test_execute_calls_add_request_on_batch_ignores_requests_that_have_a_non_transient_error_already(
         self,
     ):
+        response = MagicMock()
+        response.error().api_transient_error.return_value = False
+        response.error().http_status.return_value = 400
+
         for request_index, _ in enumerate(self.requests[:-1]):
-            self.batch._errors[request_index] = MagicMock()
-            self.batch._errors[request_index].is_transient = False
+            self.batch._default_failure_callback(
+                response=response, request_index=request_index
+            )
 
         self.batch.execute()
 
@@ -142,9 +220,13 @@ class TestFacebookBatch(TestCase):
     def test_execute_calls_add_request_on_batch_execute_requests_that_have_a_transient_error_already(
         self, mock_should_retry,
     ):
+        response = MagicMock()
+        response.error().api_transient_error.return_value = True
+
         for request_index, _ in enumerate(self.requests[:-1]):
-            self.batch._errors[request_index] = MagicMock()
-            self.batch._errors[request_index].is_transient = True
+            self.batch._default_failure_callback(
+                response=response, request_index=request_index
+            )
 
         self.batch.execute()
         self.batch._batch.add_request.assert_has_calls(
@@ -171,50 +253,194 @@ class TestFacebookBatch(TestCase):
         except RetryError:
             pass
 
-        self.assertEqual(
-            self.batch.execute.retry.statistics.get("attempt_number"),
-            FacebookBatch.MAX_ATTEMPTS,
-        )
+        self.assertEqual(self.api.new_batch.call_count, FacebookBatch.MAX_ATTEMPTS)
 
     @patch(
         "wespe.batch_uploaders.facebook.should_retry_facebook_batch", return_value=False
     )
     def test_execute_does_not_retry_when_should_retry_is_False(self, mock_should_retry):
         self.batch.execute()
-        self.assertEqual(self.batch.execute.retry.statistics.get("attempt_number"), 1)
+        self.api.new_batch.assert_called_once_with()
+
+    @patch("wespe.batch_uploaders.facebook.facebook_batch.time.sleep")
+    @patch(
+        "wespe.batch_uploaders.facebook.facebook_batch.should_retry_facebook_batch", return_value=True
+    )
+    def test_execute_waits_between_attempts_but_not_after_the_last_one(
+        self, mock_should_retry, mock_sleep
+    ):
+        with self.assertRaises(RetryError):
+            self.batch.execute()
+
+        self.assertEqual(mock_sleep.call_count, FacebookBatch.MAX_ATTEMPTS - 1)
+
+    @patch("wespe.batch_uploaders.facebook.facebook_batch.time.sleep")
+    @patch(
+        "wespe.batch_uploaders.facebook.facebook_batch.should_retry_facebook_batch", return_value=True
+    )
+    def test_execute_waits_for_the_longest_Retry_After_among_transient_errors(
+        self, mock_should_retry, mock_sleep
+    ):
+        for request_index, retry_after in enumerate(["3", "7"]):
+            response = MagicMock()
+            response.error().api_transient_error.return_value = True
+            response.error().http_headers.return_value = [
+                {"name": "Retry-After", "value": retry_after}
+            ]
+            self.batch._default_failure_callback(
+                response=response, request_index=request_index
+            )
+
+        with self.assertRaises(RetryError):
+            self.batch.execute()
+
+        mock_sleep.assert_has_calls([call(7.0)] * (FacebookBatch.MAX_ATTEMPTS - 1))
+
+    @patch.object(FacebookBatch, "WAIT_RETRY_AFTER_MAX_IN_SECONDS", 60)
+    def test_get_waiting_time_in_seconds_bounds_Retry_After_by_its_max_threshold(self):
+        _fail_with_retry_after(self.batch, "3600")
+        self.assertEqual(self.batch._get_waiting_time_in_seconds(1), 60)
+
+    @patch.object(FacebookBatch, "WAIT_JITTER_MAX_IN_SECONDS", 1)
+    @patch("wespe.batch_uploaders.facebook.facebook_batch.random.uniform")
+    def test_get_waiting_time_in_seconds_adds_a_random_jitter_on_top_of_Retry_After(
+        self, mock_uniform
+    ):
+        mock_uniform.return_value = 0.5
+        _fail_with_retry_after(self.batch, "3")
 
-    def test_initialize_execution_retrial_conditions_sets_the_right_retrial_arguments_for_execution(
+        self.assertEqual(self.batch._get_waiting_time_in_seconds(1), 3.5)
+
+    def test_failure_callback_error_has_no_Retry_After_when_the_header_is_not_finite(self):
+        for retry_after in ("nan", "inf"):
+            with self.subTest(retry_after=retry_after):
+                _fail_with_retry_after(self.batch, retry_after)
+                self.assertIsNone(self.batch.errors[0].retry_after)
+
+    def test_failure_callback_error_reads_Retry_After_from_a_mapping_of_headers(self):
+        response = MagicMock()
+        response.error().http_headers.return_value = {"retry-after": "2"}
+        self.batch._default_failure_callback(response=response, request_index=0)
+
+        self.assertEqual(self.batch.errors[0].retry_after, 2.0)
+
+    def test_failure_callback_error_has_no_Retry_After_when_the_header_is_missing(self):
+        response = MagicMock()
+        response.error().http_headers.return_value = [
+            {"name": "Content-Type", "value": "application/json"}
+        ]
+        self.batch._default_failure_callback(response=response, request_index=0)
+
+        self.assertIsNone(self.batch.errors[0].retry_after)
+
+    @patch.object(FacebookBatch, "WAIT_EXPONENTIAL_MULTIPLIER", 1)
+    @patch.object(FacebookBatch, "WAIT_EXPONENTIAL_MIN_IN_SECONDS", 2)
+    @patch.object(FacebookBatch, "WAIT_EXPONENTIAL_MAX_IN_SECONDS", 10)
+    def test_get_waiting_time_in_seconds_grows_exponentially_within_the_min_and_max_thresholds(
         self,
     ):
-        self.batch.MAX_ATTEMPTS = MagicMock()
-        self.batch.WAIT_EXPONENTIAL_MULTIPLIER = MagicMock()
-        self.batch.WAIT_EXPONENTIAL_MIN_IN_SECONDS = MagicMock()
-        self.batch.WAIT_EXPONENTIAL_MAX_IN_SECONDS = MagicMock()
+        self.assertListEqual(
+            [
+                self.batch._get_waiting_time_in_seconds(attempt_number)
+                for attempt_number in range(1, 7)
+            ],
+            [2, 2, 4, 8, 10, 10],
+        )
 
-        self.batch._initialize_execution_retrial_conditions()
+    @patch.object(FacebookBatch, "WAIT_EXPONENTIAL_MULTIPLIER", 1)
+    @patch.object(FacebookBatch, "WAIT_EXPONENTIAL_MIN_IN_SECONDS", 2)
+    @patch.object(FacebookBatch, "WAIT_EXPONENTIAL_MAX_IN_SECONDS", 10)
+    @patch.object(FacebookBatch, "WAIT_JITTER_MAX_IN_SECONDS", 1)
+    @patch("wespe.batch_uploaders.facebook.facebook_batch.random.uniform")
+    def test_get_waiting_time_in_seconds_adds_a_random_jitter_up_to_its_max_threshold(
+        self, mock_uniform
+    ):
+        mock_uniform.return_value = 0.5
 
-        retry_settings = self.batch.execute.retry
+        self.assertEqual(self.batch._get_waiting_time_in_seconds(3), 4.5)
+        mock_uniform.assert_called_once_with(0, 1)
 
-        with self.subTest("sets the maximum number of attempts"):
-            self.assertEqual(
-                retry_settings.stop.max_attempt_number, self.batch.MAX_ATTEMPTS
-            )
+    def test_reset_clears_responses_and_errors(self):
+        self.batch._responses[0] = MagicMock()
+        self.batch._errors[1] = MagicMock()
 
-        with self.subTest("sets the exponential multiplier"):
-            self.assertEqual(
-                retry_settings.wait.multiplier, self.batch.WAIT_EXPONENTIAL_MULTIPLIER
-            )
+        requests = [STUB_REQUEST] * 5
+        self.batch.reset(requests, api=self.api)
+
+        with self.subTest("responses"):
+            self.assertListEqual(self.batch.responses, [None] * len(requests))
 
-        with self.subTest("sets the exponential minimum threshold"):
-            self.assertEqual(
-                retry_settings.wait.min, self.batch.WAIT_EXPONENTIAL_MIN_IN_SECONDS
+        with self.subTest("errors"):
+            self.assertListEqual(self.batch.errors, [None] * len(requests))
+
+    def test_reset_only_uses_the_slots_starting_at_offset_of_shared_responses_and_errors(
+        self,
+    ):
+        responses = [object() for _ in range(10)]
+        errors = [object() for _ in range(10)]
+        expected_responses = responses[:3] + [None] * 5 + responses[8:]
+        expected_errors = errors[:3] + [None] * 5 + errors[8:]
+
+        self.batch.reset(
+            [STUB_REQUEST] * 5, api=self.api, responses=responses, errors=errors, offset=3
+        )
+        self.batch._default_success_callback(response=MagicMock(), request_index=0)
+
+        with self.subTest("responses"):
+            self.assertIs(self.batch._responses, responses)
+            self.assertIsInstance(responses[3], FacebookBatchResponse)
+            self.assertListEqual(
+                responses[:3] + responses[4:],
+                expected_responses[:3] + expected_responses[4:],
             )
 
-        with self.subTest("sets the exponential maximum threshold"):
-            self.assertEqual(
-                retry_settings.wait.max, self.batch.WAIT_EXPONENTIAL_MAX_IN_SECONDS
+        with self.subTest("errors"):
+            self.assertIs(self.batch._errors, errors)
+            self.assertListEqual(errors, expected_errors)
+
+    def test_reset_marks_every_request_to_be_sent_again(self):
+        for request_index, _ in enumerate(self.requests):
+            self.batch._default_success_callback(
+                response=MagicMock(), request_index=request_index
             )
 
+        self.batch.reset(self.requests, api=self.api)
+        self.batch.execute()
+
+        self.assertEqual(
+            self.batch._batch.add_request.call_count, len(self.requests)
+        )
+
+    def test_reset_raises_NoFacebookRequestProvidedError_when_request_list_is_empty(
+        self,
+    ):
+        with self.assertRaises(NoFacebookRequestProvidedError):
+            self.batch.reset(requests=[], api=self.api)
+
+    def test_instances_have_no_dict(self):
+        with self.subTest("FacebookBatch"):
+            self.assertFalse(hasattr(self.batch, "__dict__"))
+
+        with self.subTest("FacebookBatchResponse"):
+            response = FacebookBatchResponse(request=MagicMock(), response=MagicMock())
+            self.assertFalse(hasattr(response, "__dict__"))
+
+        with self.subTest("FacebookBatchRequestError"):
+            error = FacebookBatchRequestError(request=MagicMock(), request_error=MagicMock())
+            self.assertFalse(hasattr(error, "__dict__"))
+
+    def test_instances_can_be_weakly_referenced(self):
+        with self.subTest("FacebookBatch"):
+            self.assertIs(weakref.ref(self.batch)(), self.batch)
+
+        with self.subTest("FacebookBatchResponse"):
+            response = FacebookBatchResponse(request=MagicMock(), response=MagicMock())
+            self.assertIs(weakref.ref(response)(), response)
+
+        with self.subTest("FacebookBatchRequestError"):
+            error = FacebookBatchRequestError(request=MagicMock(), request_error=MagicMock())
+            self.assertIs(weakref.ref(error)(), error)
+
     def test_requests_property_returns_the_requests(self):
         self.assertEqual(self.batch.requests, self.batch._requests)
 
@@ -223,3 +449,14 @@ class TestFacebookBatch(TestCase):
 
     def test_errors_property_returns_the_errors(self):
         self.assertEqual(self.batch.errors, self.batch._errors)
+
+
+def _fail_with_retry_after(batch, retry_after):
+    """
+    Fails the first request of the given batch with a transient error, whose response has the given Retry-After
+    header.
+    """
+    response = MagicMock()
+    response.error().api_transient_error.return_value = True
+    response.error().http_headers.return_value = {"Retry-After": retry_after}
+    batch._default_failure_callback(response=response, request_index=0)
@@ -1,5 +1,5 @@
 # coding: utf8
-from itertools import chain
+import asyncio
 from unittest import TestCase
 from unittest.mock import (
     MagicMock,
@@ -8,21 +8,28 @@ from unittest.mock import (
 )
 
 from facebook_business import FacebookAdsApi
+from facebook_business.exceptions import FacebookRequestError
+from facebook_business.session import FacebookSession
+from requests.adapters import HTTPAdapter
 from tenacity import RetryError
 
 from wespe.batch_uploaders import FacebookBatchUploader
 from wespe.batch_uploaders.facebook import (
     FacebookBatch,
+    FacebookBatchRequestError,
 )
 from wespe.exceptions import (
     BatchExecutionError,
     InvalidValueError,
 )
 
+STUB_REQUEST = MagicMock()
+
 
 class TestFacebookBatchUploader(TestCase):
     def setUp(self):
-        self.requests = [MagicMock()] * 49
+        STUB_REQUEST.reset_mock()
+        self.requests = [STUB_REQUEST] * 49
         self.api = MagicMock()
         self.batch_uploader = FacebookBatchUploader(
             requests=self.requests, api=self.api
@@ -46,6 +53,139 @@ class TestFacebookBatchUploader(TestCase):
         with self.assertRaises(InvalidValueError):
             self.batch_uploader.execute(chunk_size=0)
 
+    def test_execute_raises_InvalidValueError_when_max_workers_is_less_than_1(self):
+        with self.assertRaises(InvalidValueError):
+            self.batch_uploader.execute(max_workers=0)
+
+    def test_execute_raises_InvalidValueError_when_max_workers_provided_to_the_constructor_is_less_than_1(
+        self,
+    ):
+        batch_uploader = FacebookBatchUploader(
+            requests=self.requests, api=self.api, max_workers=0
+        )
+
+        with self.assertRaises(InvalidValueError):
+            batch_uploader.execute()
+
+    @patch("wespe.batch_uploaders.facebook.facebook_batch_uploader.ThreadPoolExecutor")
+    def test_execute_uses_the_max_workers_provided_to_the_constructor_by_default(
+        self, mock_executor
+    ):
+        batch_uploader = FacebookBatchUploader(
+            requests=self.requests, api=self.api, max_workers=2
+        )
+        batch_uploader.execute(chunk_size=5)
+        mock_executor.assert_called_once_with(max_workers=2)
+
+    @patch.object(FacebookBatch, "execute")
+    def test_execute_calls_execute_in_every_FacebookBatch_when_using_multiple_workers(
+        self, mock_execute
+    ):
+        chunk_size = 5
+        self.batch_uploader.execute(chunk_size=chunk_size, max_workers=3)
+        self.assertEqual(mock_execute.call_count, -(-len(self.requests) // chunk_size))
+
+    @patch("wespe.batch_uploaders.facebook.facebook_batch_uploader.ThreadPoolExecutor")
+    def test_execute_does_not_use_more_workers_than_chunks(self, mock_executor):
+        self.batch_uploader.execute(chunk_size=25, max_workers=4)
+        mock_executor.assert_called_once_with(max_workers=2)
+
+    @patch.object(FacebookBatch, "execute")
+    def test_execute_grows_the_connection_pool_of_the_api_session_to_fit_all_workers(
+        self, mock_execute
+    ):
+        self.api._session = FacebookSession()
+        graph_url = self.api._session.GRAPH
+
+        self.batch_uploader.execute(chunk_size=1, max_workers=20)
+
+        self.assertEqual(
+            self.api._session.requests.get_adapter(graph_url)._pool_maxsize, 20
+        )
+
+    @patch.object(FacebookBatch, "execute")
+    def test_execute_keeps_the_connection_pool_of_the_api_session_when_it_fits_all_workers(
+        self, mock_execute
+    ):
+        self.api._session = FacebookSession()
+        adapter = self.api._session.requests.get_adapter(self.api._session.GRAPH)
+
+        self.batch_uploader.execute(chunk_size=1, max_workers=2)
+
+        self.assertIs(
+            self.api._session.requests.get_adapter(self.api._session.GRAPH), adapter
+        )
+
+    @patch.object(FacebookBatch, "execute")
+    def test_execute_reuses_the_connection_pool_of_the_api_session_across_executions(
+        self, mock_execute
+    ):
+        self.api._session = FacebookSession()
+        graph_url = self.api._session.GRAPH
+
+        self.batch_uploader.execute(chunk_size=1, max_workers=20)
+        adapter = self.api._session.requests.get_adapter(graph_url)
+        self.batch_uploader.execute(chunk_size=1, max_workers=20)
+
+        self.assertIs(self.api._session.requests.get_adapter(graph_url), adapter)
+
+    @patch.object(FacebookBatch, "execute")
+    def test_execute_closes_the_connection_pool_it_replaced(self, mock_execute):
+        self.api._session = FacebookSession()
+        adapter = self.api._session.requests.get_adapter(self.api._session.GRAPH)
+
+        with patch.object(adapter, "close") as mock_close:
+            self.batch_uploader.execute(chunk_size=1, max_workers=20)
+
+        mock_close.assert_called_once_with()
+
+    @patch.object(FacebookBatch, "execute")
+    def test_execute_keeps_a_custom_adapter_of_the_api_session(self, mock_execute):
+        class CustomAdapter(HTTPAdapter):
+            pass
+
+        self.api._session = FacebookSession()
+        adapter = CustomAdapter()
+        self.api._session.requests.mount(self.api._session.GRAPH, adapter)
+
+        self.batch_uploader.execute(chunk_size=1, max_workers=20)
+
+        self.assertIs(
+            self.api._session.requests.get_adapter(self.api._session.GRAPH), adapter
+        )
+
+    def test_execute_does_nothing_when_no_requests_were_provided(self):
+        batch_uploader = FacebookBatchUploader(requests=[], api=self.api)
+        self.assertIs(batch_uploader.execute(), batch_uploader)
+
+    @patch.object(FacebookBatch, "execute")
+    def test_execute_reuses_a_single_FacebookBatch_when_using_a_single_worker(
+        self, mock_execute
+    ):
+        self.batch_uploader.execute(chunk_size=5, max_workers=1)
+        self.assertEqual(len(self.batch_uploader._pool._batches), 1)
+
+    @patch.object(FacebookBatch, "execute", side_effect=KeyError)
+    def test_execute_releases_the_FacebookBatch_when_its_execution_fails(
+        self, mock_execute
+    ):
+        with self.assertRaises(KeyError):
+            self.batch_uploader.execute(max_workers=1)
+
+        self.assertEqual(len(self.batch_uploader._pool._batches), 1)
+
+    @patch.object(FacebookBatch, "execute")
+    def test_execute_leaves_no_requests_nor_results_in_released_batches(
+        self, mock_execute
+    ):
+        self.batch_uploader.execute(chunk_size=5, max_workers=1)
+        batch = self.batch_uploader._pool._batches[0]
+
+        self.assertEqual(
+            (batch._batch, batch._requests, batch._responses, batch._errors),
+            (None, (), [], []),
+        )
+
     @patch.object(FacebookBatch, "execute")
     def test_execute_calls_execute_in_FacebookBatch(self, mock_execute):
         self.batch_uploader.execute()
@@ -61,30 +201,136 @@ class TestFacebookBatchUploader(TestCase):
     def test_execute_generates_a_single_batch_for_50_requests_when_using_default_chunk_size(
         self, mock_execute
     ):
-        requests = [MagicMock()] * 50
+        requests = [STUB_REQUEST] * 50
         batch_uploader = FacebookBatchUploader(requests=requests, api=self.api)
         batch_uploader.execute()
-        self.assertEqual(len(batch_uploader._batches), round(len(self.requests) / 50))
+        self.assertEqual(mock_execute.call_count, 1)
 
     @patch.object(FacebookBatch, "execute")
-    def test_execute_generates_as_many_batches_as_the_rounded_number_of_requests_per_chunk_size(
+    def test_execute_generates_as_many_batches_as_the_number_of_requests_per_chunk_size_rounded_up(
         self, mock_execute
     ):
-        chunk_size = 5
-        self.batch_uploader.execute(chunk_size=chunk_size)
-        self.assertEqual(
-            len(self.batch_uploader._batches), round(len(self.requests) / chunk_size)
-        )
+        # 49 requests in chunks of 20 need 3 batches, even though 49 / 20 rounds to 2
+        for chunk_size, num_batches in ((5, 10), (20, 3), (49, 1)):
+            with self.subTest(chunk_size=chunk_size):
+                mock_execute.reset_mock()
+                self.batch_uploader.execute(chunk_size=chunk_size)
+                self.assertEqual(mock_execute.call_count, num_batches)
+
+    def test_execute_splits_requests_in_chunks_of_chunk_size_preserving_their_order(
+        self,
+    ):
+        requests = [MagicMock() for _ in range(12)]
+        batch_uploader = FacebookBatchUploader(requests=requests, api=self.api)
+        chunks = []
+
+        with patch.object(
+            FacebookBatch,
+            "execute",
+            autospec=True,
+            side_effect=lambda batch: chunks.append(list(batch.requests)),
+        ):
+            batch_uploader.execute(chunk_size=5, max_workers=1)
+
+        self.assertListEqual(chunks, [requests[0:5], requests[5:10], requests[10:12]])
+
+    @patch.object(FacebookBatch, "execute")
+    def test_execute_accepts_requests_provided_as_a_tuple(self, mock_execute):
+        requests = tuple(MagicMock() for _ in range(12))
+        batch_uploader = FacebookBatchUploader(requests=requests, api=self.api)
+        batch_uploader.execute(chunk_size=5)
+
+        with self.subTest("keeps the tuple as is"):
+            self.assertIs(batch_uploader.requests, requests)
+
+        with self.subTest("executes all chunks"):
+            self.assertEqual(mock_execute.call_count, 3)
 
     @patch.object(FacebookBatchUploader, "errors", new_callable=PropertyMock)
     @patch.object(FacebookBatch, "execute")
     def test_execute_raises_BatchExecutionError_when_errors_exist(
         self, mock_execute, mock_errors
     ):
-        mock_errors.return_value = [MagicMock()] * len(self.requests)
+        mock_errors.return_value = [STUB_REQUEST] * len(self.requests)
+        with self.assertRaises(BatchExecutionError):
+            self.batch_uploader.execute()
+
+    @patch.object(FacebookBatchUploader, "errors", new_callable=PropertyMock)
+    @patch.object(FacebookBatch, "execute")
+    def test_execute_raises_BatchExecutionError_with_the_number_of_failed_requests(
+        self, mock_execute, mock_errors
+    ):
+        mock_errors.return_value = [STUB_REQUEST, None, STUB_REQUEST] + [None] * (
+            len(self.requests) - 3
+        )
+
+        with self.assertRaisesRegex(
+            BatchExecutionError,
+            "^2 requests failed out of {}".format(len(self.requests)),
+        ):
+            self.batch_uploader.execute()
+
+    def test_execute_raises_BatchExecutionError_counting_real_FacebookBatchRequestError_instances(
+        self,
+    ):
+        error = FacebookBatchRequestError(
+            request=STUB_REQUEST,
+            request_error=FacebookRequestError(
+                "Call was not successful",
+                request_context={},
+                http_status=400,
+                http_headers={},
+                body='{"error": {"message": "Invalid parameter", "code": 100}}',
+            ),
+        )
+
+        with patch.object(
+            FacebookBatch, "execute", autospec=True, side_effect=_fill_batch(errors=error)
+        ):
+            with self.assertRaisesRegex(
+                BatchExecutionError,
+                "^{0} requests failed out of {0}".format(len(self.requests)),
+            ):
+                self.batch_uploader.execute()
+
+    def test_execute_raises_BatchExecutionError_holding_the_errors_without_copying_them(
+        self,
+    ):
+        with patch.object(
+            FacebookBatch, "execute", autospec=True, side_effect=_fill_batch(errors=STUB_REQUEST)
+        ):
+            with self.assertRaises(BatchExecutionError) as context:
+                self.batch_uploader.execute()
+
+        self.assertIs(context.exception.errors, self.batch_uploader.errors)
+
+    @patch.object(FacebookBatchUploader, "execute")
+    def test_execute_async_awaits_execute_with_the_provided_arguments(
+        self, mock_execute
+    ):
+        mock_execute.return_value = self.batch_uploader
+        result = asyncio.run(
+            self.batch_uploader.execute_async(chunk_size=5, max_workers=2)
+        )
+
+        mock_execute.assert_called_once_with(5, 2)
+        self.assertIs(result, self.batch_uploader)
+
+    @patch.object(FacebookBatchUploader, "errors", new_callable=PropertyMock)
+    @patch.object(FacebookBatch, "execute")
+    def test_execute_async_raises_BatchExecutionError_when_errors_exist(
+        self, mock_execute, mock_errors
+    ):
+        mock_errors.return_value = [STUB_REQUEST] * len(self.requests)
         with self.assertRaises(BatchExecutionError):
+            asyncio.run(self.batch_uploader.execute_async())
+
+    def test_execute_can_be_patched_on_an_instance(self):
+        with patch.object(self.batch_uploader, "execute") as mock_execute:
             self.batch_uploader.execute()
 
+        mock_execute.assert_called_once_with()
+
     def test_requests_returns_the_same_requests_that_were_provided_to_the_constructor(
         self,
     ):
@@ -100,26 +346,41 @@ class TestFacebookBatchUploader(TestCase):
         self.assertListEqual(list(self.batch_uploader.items), [])
 
     def test_errors_returns_errors_when_a_batch_has_any(self):
-        facebook_batch = MagicMock()
-        facebook_batch.errors = [MagicMock()] * len(self.requests)
-        self.batch_uploader._batches = [facebook_batch]
+        error = MagicMock()
 
-        self.assertListEqual(list(self.batch_uploader.errors), facebook_batch.errors)
+        with patch.object(
+            FacebookBatch, "execute", autospec=True, side_effect=_fill_batch(errors=error)
+        ):
+            try:
+                self.batch_uploader.execute()
+            except BatchExecutionError:
+                pass
+
+        self.assertListEqual(self.batch_uploader.errors, [error] * len(self.requests))
 
     def test_responses_returns_responses_when_a_batch_has_any(self):
-        facebook_batch = MagicMock()
-        facebook_batch.responses = [MagicMock()] * len(self.requests)
-        self.batch_uploader._batches = [facebook_batch]
+        response = MagicMock()
+
+        with patch.object(
+            FacebookBatch, "execute", autospec=True, side_effect=_fill_batch(responses=response)
+        ):
+            self.batch_uploader.execute()
 
         self.assertListEqual(
-            list(self.batch_uploader.responses), facebook_batch.responses
+            self.batch_uploader.responses, [response] * len(self.requests)
         )
 
     def test_items_returns_a_triple_with_requests_and_responses_and_errors(self):
-        facebook_batch = MagicMock()
-        facebook_batch.responses = [MagicMock()] * len(self.requests)
-        facebook_batch.errors = [MagicMock()] * len(self.requests)
-        self.batch_uploader._batches = [facebook_batch]
+        with patch.object(
+            FacebookBatch,
+            "execute",
+            autospec=True,
+            side_effect=_fill_batch(responses=MagicMock(), errors=MagicMock()),
+        ):
+            try:
+                self.batch_uploader.execute()
+            except BatchExecutionError:
+                pass
 
         self.assertListEqual(
             list(self.batch_uploader.items),
@@ -132,26 +393,70 @@ class TestFacebookBatchUploader(TestCase):
             ),
         )
 
+    @patch.object(FacebookBatch, "execute")
+    def test_execute_returns_lists_of_None_for_responses_and_errors_after_execution(
+        self, mock_execute
+    ):
+        self.batch_uploader.execute(chunk_size=5)
+
+        with self.subTest("responses"):
+            self.assertListEqual(self.batch_uploader.responses, [None] * len(self.requests))
+
+        with self.subTest("errors"):
+            self.assertListEqual(self.batch_uploader.errors, [None] * len(self.requests))
+
     def test_errors_returns_all_errors_when_multiple_batches_exist(self):
-        facebook_batch_1 = MagicMock()
-        facebook_batch_1._errors = [MagicMock()] * (len(self.requests) - 1)
-        facebook_batch_2 = MagicMock()
-        facebook_batch_2.errors = [MagicMock()]
-        self.batch_uploader._batches = [facebook_batch_1, facebook_batch_2]
+        errors = [MagicMock(), MagicMock()]
+        fill_batches = iter([_fill_batch(errors=error) for error in errors])
+
+        with patch.object(
+            FacebookBatch,
+            "execute",
+            autospec=True,
+            side_effect=lambda batch: next(fill_batches)(batch),
+        ):
+            try:
+                self.batch_uploader.execute(
+                    chunk_size=len(self.requests) - 1, max_workers=1
+                )
+            except BatchExecutionError:
+                pass
 
         self.assertListEqual(
-            list(self.batch_uploader.errors),
-            list(chain(facebook_batch_1.errors, facebook_batch_2.errors)),
+            self.batch_uploader.errors,
+            [errors[0]] * (len(self.requests) - 1) + [errors[1]],
         )
 
     def test_responses_returns_all_responses_when_multiple_batches_exist(self):
-        facebook_batch_1 = MagicMock()
-        facebook_batch_1._responses = [MagicMock()] * (len(self.requests) - 1)
-        facebook_batch_2 = MagicMock()
-        facebook_batch_2.responses = [MagicMock()]
-        self.batch_uploader._batches = [facebook_batch_1, facebook_batch_2]
+        responses = [MagicMock(), MagicMock()]
+        fill_batches = iter([_fill_batch(responses=response) for response in responses])
+
+        with patch.object(
+            FacebookBatch,
+            "execute",
+            autospec=True,
+            side_effect=lambda batch: next(fill_batches)(batch),
+        ):
+            self.batch_uploader.execute(
+                chunk_size=len(self.requests) - 1, max_workers=1
+            )
 
         self.assertListEqual(
-            list(self.batch_uploader.responses),
-            list(chain(facebook_batch_1.responses, facebook_batch_2.responses)),
+            self.batch_uploader.responses,
+            [responses[0]] * (len(self.requests) - 1) + [responses[1]],
         )
+
+
+def _fill_batch(responses=None, errors=None):
+    """
+    Returns a side effect for FacebookBatch.execute, which sets the given response and error for every request of
+    the executed batch.
+    """
+
+    def execute(batch):
+        start, end = batch._offset, batch._offset + len(batch.requests)
+        batch._responses[start:end] = [responses] * len(batch.requests)
+        batch._errors[start:end] = [errors] * len(batch.requests)
+        return batch
+
+    return execute
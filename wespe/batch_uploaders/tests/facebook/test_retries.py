@@ -0,0 +1,28 @@
+# coding: utf8
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from wespe.batch_uploaders.facebook import should_retry_facebook_batch
+
+
+class TestShouldRetryFacebookBatch(TestCase):
+    def setUp(self):
+        self.facebook_batch = MagicMock()
+
+    def test_returns_False_when_there_are_no_errors(self):
+        self.facebook_batch.errors = [None] * 10
+        self.assertFalse(should_retry_facebook_batch(self.facebook_batch))
+
+    def test_returns_False_when_all_errors_are_non_transient(self):
+        self.facebook_batch.errors = [MagicMock(is_transient=False), None]
+        self.assertFalse(should_retry_facebook_batch(self.facebook_batch))
+
+    def test_returns_True_when_any_error_is_transient_even_if_other_requests_succeeded(
+        self,
+    ):
+        self.facebook_batch.errors = [
+            None,
+            MagicMock(is_transient=False),
+            MagicMock(is_transient=True),
+        ]
+        self.assertTrue(should_retry_facebook_batch(self.facebook_batch))
@@ -0,0 +1,71 @@
+# coding: utf8
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from wespe.batch_uploaders.requests import (
+    BaseRequestError,
+    BaseResponse,
+)
+
+
+class TestBaseResponse(TestCase):
+    def setUp(self):
+        self.response = BaseResponse(data={"id": 1})
+
+    def test_equals_itself_without_comparing_its_data(self):
+        self.response._data = MagicMock(__eq__=MagicMock(side_effect=AssertionError))
+        self.assertEqual(self.response, self.response)
+
+    def test_equals_another_response_sharing_its_data_without_comparing_it(self):
+        data = MagicMock(__eq__=MagicMock(side_effect=AssertionError))
+        self.assertEqual(BaseResponse(data=data), BaseResponse(data=data))
+
+    def test_equals_another_response_with_the_same_data(self):
+        self.assertEqual(self.response, BaseResponse(data={"id": 1}))
+
+    def test_does_not_equal_another_response_with_different_data(self):
+        self.assertNotEqual(self.response, BaseResponse(data={"id": 2}))
+
+    def test_does_not_equal_None(self):
+        self.assertNotEqual(self.response, None)
+
+    def test_is_not_hashable(self):
+        with self.assertRaises(TypeError):
+            hash(self.response)
+
+    def test_str_returns_the_data_as_a_string(self):
+        self.assertEqual(str(self.response), str({"id": 1}))
+
+
+class TestBaseRequestError(TestCase):
+    def setUp(self):
+        self.error = BaseRequestError(
+            description="error", is_transient=False, data={"code": 1}
+        )
+
+    def test_equals_itself_without_comparing_its_data(self):
+        self.error._data = MagicMock(__eq__=MagicMock(side_effect=AssertionError))
+        self.assertEqual(self.error, self.error)
+
+    def test_equals_another_error_sharing_its_data_without_comparing_it(self):
+        data = MagicMock(__eq__=MagicMock(side_effect=AssertionError))
+        self.assertEqual(
+            BaseRequestError(description="error", is_transient=False, data=data),
+            BaseRequestError(description="error", is_transient=False, data=data),
+        )
+
+    def test_equals_another_error_with_the_same_data(self):
+        self.assertEqual(
+            self.error,
+            BaseRequestError(description="error", is_transient=False, data={"code": 1}),
+        )
+
+    def test_does_not_equal_None(self):
+        self.assertNotEqual(self.error, None)
+
+    def test_is_not_hashable(self):
+        with self.assertRaises(TypeError):
+            hash(self.error)
+
+    def test_repr_returns_the_data_as_a_string(self):
+        self.assertEqual(repr(self.error), repr({"code": 1}))
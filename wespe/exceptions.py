@@ -1,16 +1,80 @@
-class BaseException(Exception):
+from typing import Iterable
+
+# BaseException is deliberately left out, so star imports don't shadow the builtin
+__all__ = [
+    "WespeError",
+    "BatchExecutionError",
+    "InvalidValueError",
+    "NoFacebookRequestProvidedError",
+    "TooManyRequestsPerBatchError",
+]
+
+
+class WespeError(Exception):
     """
-    All errors specific to to this library will be subclassed from BaseException.
+    All errors specific to to this library will be subclassed from WespeError.
     """
 
     pass
 
 
-class BatchExecutionError(IOError, BaseException):
-    pass
+# Kept for backwards compatibility. Prefer WespeError, since this name shadows the builtin BaseException.
+BaseException = WespeError
+
+
+class BatchExecutionError(IOError, WespeError):
+    """
+    Raised when one or more requests failed. The errors are kept as is, and only formatted into a message when
+    the exception is rendered, unless a message was provided.
+
+    :param message: (Optional) A message describing the failure.
+    :param num_failed_requests: (Optional) The amount of requests that failed.
+    :param num_requests: (Optional) The amount of requests that were executed.
+    :param errors: (Optional) The errors of all requests, with None for the ones that succeeded.
+    """
+
+    def __init__(
+        self,
+        message: str = None,
+        *,
+        num_failed_requests: int = None,
+        num_requests: int = None,
+        errors: Iterable = ()
+    ):
+        if message is None:
+            super().__init__()
+        else:
+            super().__init__(message)
+
+        self.message = message
+        self.num_failed_requests = num_failed_requests
+        self.num_requests = num_requests
+        self.errors = errors
+
+    def __reduce__(self):
+        # Pickling and copying rebuild the exception from its message, then restore the counts and errors
+        return type(self), self.args, self.__dict__
+
+    def __repr__(self):
+        if self.message is not None:
+            return "{}({!r})".format(type(self).__name__, self.message)
+
+        return "{}(num_failed_requests={!r}, num_requests={!r})".format(
+            type(self).__name__, self.num_failed_requests, self.num_requests
+        )
+
+    def __str__(self):
+        if self.message is not None:
+            return self.message
+
+        return "{} requests failed out of {}\n\n{}".format(
+            self.num_failed_requests,
+            self.num_requests,
+            [error for error in self.errors if error is not None],
+        )
 
 
-class InvalidValueError(ValueError, BaseException):
+class InvalidValueError(ValueError, WespeError):
     pass
 
 
@@ -0,0 +1,84 @@
+# coding: utf8
+import copy
+import pickle
+from unittest import TestCase
+
+from wespe import exceptions
+from wespe.exceptions import (
+    BatchExecutionError,
+    InvalidValueError,
+    NoFacebookRequestProvidedError,
+    TooManyRequestsPerBatchError,
+    WespeError,
+)
+
+
+class TestWespeError(TestCase):
+    def test_is_the_base_of_all_errors_of_this_library(self):
+        for error_class in (
+            BatchExecutionError,
+            InvalidValueError,
+            NoFacebookRequestProvidedError,
+            TooManyRequestsPerBatchError,
+        ):
+            with self.subTest(error_class.__name__):
+                self.assertTrue(issubclass(error_class, WespeError))
+
+    def test_is_still_available_as_BaseException_for_backwards_compatibility(self):
+        self.assertIs(exceptions.BaseException, WespeError)
+
+    def test_star_import_does_not_shadow_the_builtin_BaseException(self):
+        namespace = {}
+        exec("from wespe.exceptions import *", namespace)
+
+        self.assertNotIn("BaseException", namespace)
+        self.assertIs(namespace["WespeError"], WespeError)
+
+
+class TestBatchExecutionError(TestCase):
+    def setUp(self):
+        self.error = BatchExecutionError(
+            num_failed_requests=2, num_requests=3, errors=["first", None, "second"]
+        )
+
+    def test_survives_a_pickle_round_trip(self):
+        error = pickle.loads(pickle.dumps(self.error))
+
+        self.assertIsInstance(error, BatchExecutionError)
+        self.assertEqual(
+            (error.num_failed_requests, error.num_requests, error.errors),
+            (2, 3, ["first", None, "second"]),
+        )
+
+    def test_can_be_copied(self):
+        error = copy.copy(self.error)
+
+        self.assertEqual(str(error), str(self.error))
+        self.assertIs(error.errors, self.error.errors)
+
+    def test_str_lists_the_failed_requests_only(self):
+        self.assertEqual(
+            str(self.error), "2 requests failed out of 3\n\n['first', 'second']"
+        )
+
+    def test_repr_exposes_the_counts(self):
+        self.assertEqual(
+            repr(self.error),
+            "BatchExecutionError(num_failed_requests=2, num_requests=3)",
+        )
+
+    def test_can_still_be_built_from_a_message(self):
+        error = BatchExecutionError("boom")
+
+        with self.subTest("str"):
+            self.assertEqual(str(error), "boom")
+
+        with self.subTest("args"):
+            self.assertEqual(error.args, ("boom",))
+
+        with self.subTest("repr"):
+            self.assertEqual(repr(error), "BatchExecutionError('boom')")
+
+    def test_survives_a_pickle_round_trip_when_built_from_a_message(self):
+        error = pickle.loads(pickle.dumps(BatchExecutionError("boom")))
+        self.assertEqual(str(error), "boom")